@@ -1,22 +1,39 @@
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, Depends
 from passlib.hash import bcrypt
 from datetime import datetime
-from database import SessionLocal, User, Base, engine, Conversation, ResearchHistory
+from database import SessionLocal, User, Base, engine, ResearchHistory, ensure_indexes
 from schemas import ResearchRequest, ResearchResponse, LoginModel, SigninRequestModel, SigninResponseModel, LoginResponseModel
 # from memory import get_history
+from memory import iter_export, user_exists, get_conversation_pk, append_brief
+from cache import cache_stats
 from pipeline import run_research_pipeline
+from warmer import BriefWarmer, get_warm_brief, record_topic_request
 from dotenv import load_dotenv
 import json
 import os
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine)
 
 load_dotenv()
 
 google_api = os.getenv("GOOGLE_API_KEY")
 # Create app instance
 app = FastAPI()
+warmer = BriefWarmer()
+
+
+@app.on_event("startup")
+def start_warmer():
+    if os.getenv("RA_WARM_ENABLED", "false").lower() in ("1", "true", "yes"):
+        warmer.start()
+
+
+@app.on_event("shutdown")
+def stop_warmer():
+    warmer.stop()
 
 
 def get_db():
@@ -31,40 +48,27 @@ def get_db():
 def generate_research(user_id: int, request: ResearchRequest, db: Session = Depends(get_db)):
     try:
         # ✅ ensure user exists
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        if not user_exists(db, user_id):
             raise HTTPException(status_code=404, detail="User not found")
 
-        # ✅ get or create conversation
-        conversation = db.query(Conversation).filter(
-            Conversation.conversation_id == request.conversation_id,
-            Conversation.user_id == user.id
-        ).first()
-
-        if not conversation:
-            conversation = Conversation(
-                conversation_id=request.conversation_id or f"conv_{datetime.utcnow().timestamp()}",
-                user_id=user.id
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-
-        # ✅ run pipeline
-        brief = run_research_pipeline(request)
-
-        # ✅ save into ResearchHistory
-        new_history = ResearchHistory(
-            topic=brief.topic,
-            summary=brief.summary,
-            sources=json.dumps([e.model_dump() for e in brief.references]),
-            conversation_id=conversation.id
-        )
-        db.add(new_history)
-        db.commit()
+        # ✅ conversation is created on first save if it doesn't exist yet
+        conversation_id = request.conversation_id or f"conv_{datetime.utcnow().timestamp()}"
+        request.conversation_id = conversation_id
+
+        # ✅ serve a precomputed brief for trending topics, else run pipeline
+        brief = None if request.follow_up else get_warm_brief(request.topic)
+        if brief is None:
+            request.user_id = str(user_id)
+            brief = run_research_pipeline(request)
+
+        # ✅ save into ResearchHistory and the conversation's rolling memory
+        append_brief(db, user_id, conversation_id, brief)
+        record_topic_request(db, request.topic)
 
         return brief.model_dump()
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -74,21 +78,17 @@ def get_conversation_history(user_id: int, conversation_id: str, db: Session = D
     """Get all research briefs for a user's conversation"""
     try:
         # ✅ verify user
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        if not user_exists(db, user_id):
             raise HTTPException(status_code=404, detail="User not found")
 
         # ✅ get conversation
-        conversation = db.query(Conversation).filter(
-            Conversation.conversation_id == conversation_id,
-            Conversation.user_id == user.id
-        ).first()
-        if not conversation:
+        conversation_pk = get_conversation_pk(db, user_id, conversation_id)
+        if conversation_pk is None:
             raise HTTPException(status_code=404, detail="Conversation not found for this user")
 
         # ✅ get history
         history = db.query(ResearchHistory).filter(
-            ResearchHistory.conversation_id == conversation.id
+            ResearchHistory.conversation_id == conversation_pk
         ).all()
 
         return {
@@ -110,6 +110,24 @@ def get_conversation_history(user_id: int, conversation_id: str, db: Session = D
         raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
 
 
+@app.get("/{user_id}/export")
+def export_history(user_id: int, db: Session = Depends(get_db)):
+    """Stream a user's full research history as NDJSON"""
+    if not user_exists(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    def stream():
+        # own session: the request-scoped one may be closed before the body is sent
+        export_db = SessionLocal()
+        try:
+            for record in iter_export(export_db, user_id):
+                yield json.dumps(record) + "\n"
+        finally:
+            export_db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.post('/signin', response_model=SigninResponseModel)
 def signin(signinData: SigninRequestModel, db: Session = Depends(get_db)):
 
@@ -155,6 +173,12 @@ def login(loginData: LoginModel, db: Session = Depends(get_db)):
     }
 
 
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Hit-rate stats for the lookup, search, LLM and warm-brief caches (shared across workers under serve.py)"""
+    return cache_stats()
+
+
 @app.get("/")
 def home():
     return {"message": "Research Assistant API is running!"}
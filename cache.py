@@ -0,0 +1,286 @@
+# cache.py - Lookup caches for hot endpoints
+#
+# Caches live in process memory by default. When RA_SHARED_CACHE_PATH is set
+# (see serve.py) the shared ones are backed by a SQLite file instead, so every
+# worker process sees the same entries.
+import os
+import pickle
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after `ttl` seconds.
+    Thread-safe, since FastAPI runs sync endpoints in a threadpool.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class SharedCache:
+    """
+    Same interface as TTLCache, backed by a SQLite file shared between worker
+    processes. Values are pickled; LRU eviction runs every `EVICT_EVERY` sets.
+    Reads only write back `accessed_at` once it is `ACCESS_RESOLUTION` seconds
+    old, so hot keys don't turn every lookup into a write. Any SQLite error
+    (e.g. "database is locked") is logged and treated as a miss.
+    Hit/miss counters are per process.
+    """
+
+    EVICT_EVERY = 64
+    ACCESS_RESOLUTION = 30.0
+
+    def __init__(self, path: str, namespace: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn().close()
+        self._local.conn = None
+
+    def _conn(self):
+        # one connection per thread and per process; never reuse one across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT, key TEXT, value BLOB, expires_at REAL, accessed_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed "
+                "ON cache_entries (namespace, accessed_at)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, repr(key)),
+            ).fetchone()
+            if row is not None and row[1] > now and now - row[2] > self.ACCESS_RESOLUTION:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, repr(key)),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.namespace}' read failed, treating as miss: {e}")
+            self._count(False)
+            return default
+
+        if row is None or row[1] <= now:
+            if row is not None:
+                self.invalidate(key)
+            self._count(False)
+            return default
+        self._count(True)
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._sets += 1
+            evict = self._sets % self.EVICT_EVERY == 0
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, repr(key), pickle.dumps(value), now + self.ttl, now),
+            )
+            if evict:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache_entries WHERE namespace = ? "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.maxsize),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.namespace}' write failed: {e}")
+
+    def invalidate(self, key):
+        try:
+            self._conn().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, repr(key)),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.namespace}' invalidation of {key!r} failed: {e}")
+
+    def clear(self):
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.namespace}' clear failed: {e}")
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        try:
+            size = self._conn().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time()),
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache '{self.namespace}' stats failed: {e}")
+            size = None
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "shared": True,
+            }
+
+
+class EvidenceStore:
+    """
+    In-process side store for evidence text, keyed by content hash. Entries are
+    pinned by each request (owner) that stored them and dropped when the last
+    owner releases, so nothing is evicted while a request is still in flight.
+    """
+
+    def __init__(self):
+        self._texts = {}
+        self._refcounts = {}
+        self._owned = {}
+        self._lock = threading.Lock()
+
+    def put(self, owner, key, text):
+        with self._lock:
+            owned = self._owned.setdefault(owner, set())
+            if key in owned:
+                return
+            owned.add(key)
+            self._texts[key] = text
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._texts.get(key, default)
+
+    def release(self, owner):
+        with self._lock:
+            for key in self._owned.pop(owner, ()):
+                self._refcounts[key] -= 1
+                if not self._refcounts[key]:
+                    del self._refcounts[key]
+                    del self._texts[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._texts)
+
+
+def make_cache(namespace: str, maxsize: int, ttl: float):
+    """A SharedCache when RA_SHARED_CACHE_PATH is set, else an in-process TTLCache"""
+    path = os.getenv("RA_SHARED_CACHE_PATH")
+    if path:
+        return SharedCache(path, namespace, maxsize=maxsize, ttl=ttl)
+    return TTLCache(maxsize=maxsize, ttl=ttl)
+
+
+# user_id -> True for users known to exist (misses are never cached)
+user_cache = make_cache("users", maxsize=4096, ttl=300.0)
+# (user_id, conversation_id) -> Conversation primary key (misses are never cached)
+conversation_cache = make_cache("conversations", maxsize=8192, ttl=300.0)
+# search query -> {"max_results", "docs"}, read through by retrieve_evidence
+evidence_cache = make_cache("evidence", maxsize=512, ttl=900.0)
+# (provider, prompt hash) -> LLM response
+llm_cache = make_cache("llm", maxsize=2048, ttl=3600.0)
+# normalized topic -> precomputed brief for trending topics (staleness checked by warmer)
+brief_cache = make_cache("briefs", maxsize=256, ttl=86400.0)
+# evidence id -> document text, so graph checkpoints only carry EvidenceRefs.
+# Read back within the same request, so it always stays in process.
+evidence_text_store = EvidenceStore()
+
+
+def cache_stats() -> dict:
+    return {
+        "users": user_cache.stats(),
+        "conversations": conversation_cache.stats(),
+        "evidence": evidence_cache.stats(),
+        "llm": llm_cache.stats(),
+        "briefs": brief_cache.stats(),
+    }
@@ -3,6 +3,8 @@ import json
 import typer
 from schemas import ResearchRequest
 from pipeline import run_research_pipeline
+from database import SessionLocal
+from memory import iter_export
 
 app = typer.Typer(add_completion=False)
 
@@ -15,6 +17,17 @@ def brief(topic: str, conversation_id: str = "local", follow_up: bool = False, m
     typer.echo(json.dumps(out.model_dump(), indent=2))
 
 
+@app.command()
+def export(user_id: int):
+    """Write a user's full research history to stdout as NDJSON."""
+    db = SessionLocal()
+    try:
+        for record in iter_export(db, user_id):
+            typer.echo(json.dumps(record))
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
     app()
 
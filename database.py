@@ -39,6 +39,8 @@ class Conversation(Base):
 
     user = relationship("User", back_populates="conversations")
     history = relationship("ResearchHistory", back_populates="conversation", cascade="all, delete")
+    memory = relationship("ConversationMemory", back_populates="conversation", uselist=False,
+                          cascade="all, delete")
 
 
 class ResearchHistory(Base):
@@ -50,6 +52,33 @@ class ResearchHistory(Base):
     sources = Column(Text)  # store as JSON string
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    conversation_id = Column(Integer, ForeignKey("conversations.id"))
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), index=True)
     conversation = relationship("Conversation", back_populates="history")
 
+
+class ConversationMemory(Base):
+    __tablename__ = "conversation_memory"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rolling_summary = Column(Text, default="")
+    key_findings = Column(Text, default="[]")  # store as JSON string
+    brief_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), unique=True, index=True)
+    conversation = relationship("Conversation", back_populates="memory")
+
+
+class TopicRequest(Base):
+    __tablename__ = "topic_requests"
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String(500))  # as the user asked it, not the LLM's restated brief topic
+    normalized_topic = Column(String(500), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+def ensure_indexes(bind=engine):
+    """Create indexes that create_all skips on tables that already exist."""
+    for index in ResearchHistory.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
@@ -3,21 +3,42 @@ from typing import List, Optional
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.documents import Document
 # from langchain_core.runnables import RunnableLambda
-from memory import append_brief
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 from schemas import ResearchBrief
-from tools import retrieve_evidence
+from tools import retrieve_evidence_multi, get_cached_evidence, compact_documents, evidence_text, EvidenceRef, is_fallback
+import replay
+from cache import llm_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
+from functools import partial
+import hashlib
+import logging
+import math
+import time
 import os
 
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 google_api_key = os.getenv("GOOGLE_API_KEY")
 os.getenv("TAVILY_API_KEY")
 
+# Retrieval planning: how many focused sub-queries to run and how long to wait for them
+MAX_SUB_QUERIES = 3
+RETRIEVAL_TIMEOUT = float(os.getenv("RA_RETRIEVAL_TIMEOUT", "15"))
+
+# Latency budget: below these many remaining seconds a node degrades instead of
+# doing the full amount of work.
+SUMMARIZE_MIN_SECONDS = 20.0       # skip the prior-context summarizer call
+FULL_RETRIEVAL_MIN_SECONDS = 15.0  # no query planning, fewer results
+LIVE_RETRIEVAL_MIN_SECONDS = 6.0   # serve cached evidence instead of searching
+STRONG_BRIEF_MIN_SECONDS = 8.0     # synthesize the brief with the summarizer model
+GENERATION_RESERVE_SECONDS = 5.0   # time kept back for the brief when retrieving
+REDUCED_MAX_RESULTS = 3
+
 # ---- LLMs (Gemini) ----
 # Use a smaller/faster model for summarization and a stronger model for brief synthesis.
 summarizer_llm = ChatGoogleGenerativeAI(
@@ -27,6 +48,22 @@ llm = ChatGoogleGenerativeAI(
     google_api_key=google_api_key, model="gemini-2.0-flash"
 )
 brief_llm = llm.with_structured_output(ResearchBrief)
+fast_brief_llm = summarizer_llm.with_structured_output(ResearchBrief)
+
+
+def llm_call(provider: str, prompt: str, fn, dump=None, load=None):
+    # Identical prompts get identical answers; serve them from the (possibly
+    # cross-process) LLM cache before going through the API. Record/replay runs
+    # bypass it so load tests see the recorded provider latency on every call.
+    if replay.provider_mode() != replay.LIVE:
+        return replay.call(provider, prompt, fn, dump=dump, load=load)
+    key = (provider, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return load(cached) if load else cached
+    response = replay.call(provider, prompt, fn, dump=dump, load=load)
+    llm_cache.set(key, dump(response) if dump else response)
+    return response
 
 # ---- Graph State ----
 
@@ -35,9 +72,34 @@ class GraphState(TypedDict):
     topic: str
     follow_up: bool
     conversation_id: Optional[str]
+    user_id: Optional[str]
     prior_context: Optional[str]        # summarized earlier briefs (if any)
-    docs: List[Document]
+    docs: List[EvidenceRef]             # compact refs; text lives in the evidence side store
     brief: Optional[ResearchBrief]
+    deadline: Optional[float]           # absolute time.time() by which to answer
+    request_id: str                     # owner of this request's evidence text in the side store
+    degradations: List[str]             # shortcuts taken to stay within the deadline
+
+
+def remaining_seconds(state: GraphState) -> float:
+    deadline = state.get("deadline")
+    if deadline is None:
+        return math.inf
+    return deadline - time.time()
+
+
+def degrade(state: GraphState, name: str):
+    state["degradations"] = (state.get("degradations") or []) + [name]
+
+
+def call_with_timeout(fn, timeout: float):
+    # Provider clients have no per-call deadline, so run the call on its own
+    # thread and stop waiting once the budget is spent (raises TimeoutError).
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bounded-call")
+    try:
+        return executor.submit(fn).result(timeout=None if math.isinf(timeout) else max(timeout, 0.0))
+    finally:
+        executor.shutdown(wait=False)
 
 # ---- Node: incorporate previous context (summary step) ----
 
@@ -54,22 +116,108 @@ def summarize_previous_briefs(prior_briefs: List[ResearchBrief]) -> str:
         "focusing on insights relevant to a new query.\n"
         + "\n".join(bullets)
     )
-    return summarizer_llm.invoke(prompt).content
+    return llm_call("gemini-summarizer", prompt, lambda: summarizer_llm.invoke(prompt).content)
+
+
+def summarize_memory(memory: Optional[dict]) -> str:
+    if not memory or not memory.get("summary"):
+        return ""
+    # The rolling memory is already bounded, so this prompt stays the same size
+    # however long the conversation grows.
+    findings = "\n".join(f"- {f}" for f in memory.get("key_findings", []))
+    prompt = (
+        "Summarize the following prior research into ~4 concise bullets, "
+        "focusing on insights relevant to a new query.\n"
+        f"Earlier briefs:\n{memory['summary']}\n"
+        + (f"Key findings so far:\n{findings}" if findings else "")
+    )
+    return llm_call("gemini-summarizer", prompt, lambda: summarizer_llm.invoke(prompt).content)
 
 
-def node_incorporate_previous(state: GraphState, get_history) -> GraphState:
-    # get_history is injected at compile-time; returns List[ResearchBrief]
-    prior = get_history(state.get("conversation_id"))
-    state["prior_context"] = summarize_previous_briefs(prior)
+def node_incorporate_previous(state: GraphState, get_history, get_memory=None) -> GraphState:
+    # get_memory / get_history are injected at compile-time; get_memory returns the
+    # conversation's rolling memory dict, get_history returns List[ResearchBrief]
+    if get_memory is not None:
+        memory = get_memory(state.get("user_id"), state.get("conversation_id"))
+        if not memory or not memory.get("summary"):
+            state["prior_context"] = ""
+            return state
+        summarize = partial(summarize_memory, memory)
+        # the rolling memory is already compact enough to use verbatim
+        verbatim = memory["summary"]
+    else:
+        prior = get_history(state.get("conversation_id"))
+        if not prior:
+            state["prior_context"] = ""
+            return state
+        summarize = partial(summarize_previous_briefs, prior)
+        verbatim = "\n".join(f"- {b.topic}: {b.summary[:300]}" for b in prior[-3:])
+
+    remaining = remaining_seconds(state)
+    if remaining >= SUMMARIZE_MIN_SECONDS:
+        # whatever the summarizer may spend, full retrieval must still fit afterwards
+        try:
+            state["prior_context"] = call_with_timeout(summarize, remaining - FULL_RETRIEVAL_MIN_SECONDS)
+            return state
+        except FutureTimeoutError:
+            logger.warning("Summarizer missed its deadline, using prior context verbatim")
+        except Exception as e:
+            logger.error(f"Summarizer failed, using prior context verbatim: {e}")
+    state["prior_context"] = verbatim
+    degrade(state, "skipped_summarization")
     return state
 
 # ---- Node: retrieve evidence ----
 
 
+def plan_queries(topic: str, prior_context: str = "") -> List[str]:
+    # Plain topics are searched as-is; only topics carrying prior context are
+    # decomposed, so simple requests don't pay for the extra planning call.
+    if not prior_context:
+        return [topic]
+    prompt = (
+        f"Split the research topic below into at most {MAX_SUB_QUERIES} short, focused web "
+        "search queries that together cover it, using the prior context only to "
+        "disambiguate. Return one query per line with no numbering or extra text.\n"
+        f"Topic: {topic}\nPrior context:\n{prior_context}"
+    )
+    try:
+        content = llm_call("gemini-planner", prompt, lambda: summarizer_llm.invoke(prompt).content)
+    except Exception:
+        return [topic]
+
+    queries = [topic]
+    for line in content.splitlines():
+        q = line.strip().lstrip("-*0123456789. ").strip()
+        if q and q.lower() not in (x.lower() for x in queries):
+            queries.append(q)
+    return queries[:MAX_SUB_QUERIES + 1]
+
+
 def node_retrieve(state: GraphState) -> GraphState:
-    ctx = state.get("prior_context") or ""
-    query = f"{state['topic']} {('context: ' + ctx) if ctx else ''}".strip()
-    state["docs"] = retrieve_evidence(query)
+    remaining = remaining_seconds(state)
+    if remaining < LIVE_RETRIEVAL_MIN_SECONDS:
+        docs = get_cached_evidence(state["topic"])
+        # nothing cached means the brief is built from placeholders; say so
+        degrade(state, "no_evidence" if is_fallback(docs) else "cached_evidence")
+        state["docs"] = compact_documents(docs, state["request_id"])
+        return state
+
+    timeout = min(RETRIEVAL_TIMEOUT, remaining - GENERATION_RESERVE_SECONDS)
+    topic, prior_context = state["topic"], state.get("prior_context") or ""
+    plan = None
+    if remaining < FULL_RETRIEVAL_MIN_SECONDS:
+        max_results = REDUCED_MAX_RESULTS
+        degrade(state, "reduced_max_results")
+    else:
+        max_results = 8
+        if prior_context:
+            # planned sub-queries join the raw topic search, which starts first
+            plan = partial(plan_queries, topic, prior_context)
+    docs = retrieve_evidence_multi([topic], max_results=max_results, timeout=timeout, limit=12, plan=plan)
+    if is_fallback(docs):
+        degrade(state, "no_evidence")
+    state["docs"] = compact_documents(docs, state["request_id"])
     return state
 
 # ---- Node: generate structured brief ----
@@ -78,10 +226,17 @@ def node_retrieve(state: GraphState) -> GraphState:
 def node_generate(state: GraphState) -> GraphState:
     # Convert docs → compact evidence list for the model
     refs = []
+    missing = 0
     for i, d in enumerate(state["docs"][:12]):
+        text = evidence_text(d)
+        if text is None:
+            missing += 1
+            text = ""
         refs.append(
-            f"[{i+1}] {d.metadata.get('title','')} — {d.metadata.get('source','')}\n{d.page_content[:500]}"
+            f"[{i+1}] {d.title} — {d.url}\n{text[:500]}"
         )
+    if missing:
+        degrade(state, "missing_evidence_text")
 
     sys = (
         "You are a research assistant. Produce a concise, evidence-linked research brief.\n"
@@ -93,29 +248,60 @@ def node_generate(state: GraphState) -> GraphState:
         f"Prior context:\n  {state['prior_context'] if state.get('prior_context') else ''}\n\n"
         "Evidence:\n" + "\n\n".join(refs)
     )
-    brief: ResearchBrief = brief_llm.invoke(prompt)
+    if remaining_seconds(state) < STRONG_BRIEF_MIN_SECONDS:
+        brief = _invoke_brief(fast_brief_llm, "gemini-brief-fast", prompt)
+        degrade(state, "fast_brief_model")
+    else:
+        try:
+            brief = _invoke_brief(brief_llm, "gemini-brief", prompt)
+        except Exception:
+            # the stronger model failed; answer with the cheaper one rather than erroring out
+            brief = _invoke_brief(fast_brief_llm, "gemini-brief-fast", prompt)
+            degrade(state, "fast_brief_model_fallback")
     state["brief"] = brief
     return state
 
+
+def _invoke_brief(model, provider: str, prompt: str) -> ResearchBrief:
+    return llm_call(
+        provider, prompt, lambda: model.invoke(prompt),
+        dump=lambda b: b.model_dump(), load=ResearchBrief.model_validate
+    )
+
 # ---- Node: end ----
 
 
 def node_end(state: GraphState) -> GraphState:
     brief = state.get('brief')
 
+    # persisting the brief is up to the caller (the API saves it via memory.append_brief)
     if brief:
-        append_brief(("conversation_id"), brief)
         brief.context_used = state.get("prior_context") or ""
     return state
 
 # ---- Graph factory ----
 
 
-def build_graph(get_history):
+def _checkpoint_serde() -> JsonPlusSerializer:
+    # Every non-builtin type in GraphState (and nested in it) has to be allowed
+    # through msgpack deserialization when checkpoints are read back.
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=[
+            ("tools", "EvidenceRef"),
+            ("schemas", "ResearchBrief"),
+            ("schemas", "Evidence"),
+        ])
+    except TypeError:
+        # older langgraph releases have no allowlist and accept any type
+        return JsonPlusSerializer()
+
+
+def build_graph(get_history, get_memory=None):
 
-    checkpoint_store = MemorySaver()
+    checkpoint_store = MemorySaver(serde=_checkpoint_serde())
     g = StateGraph(GraphState)
-    g.add_node("IncorporatePreviousBriefs", lambda s: node_incorporate_previous(s, get_history))
+    g.add_node("IncorporatePreviousBriefs",
+               lambda s: node_incorporate_previous(s, get_history, get_memory))
     g.add_node("RetrieveEvidence", node_retrieve)
     g.add_node("GenerateBrief", node_generate)
     g.add_node("Finish", node_end)
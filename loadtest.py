@@ -0,0 +1,92 @@
+# loadtest.py - asyncio load driver for the research API
+#
+# Record once against the live providers, then replay as often as needed with
+# no provider quota used, e.g.
+#   RA_PROVIDER_MODE=record uvicorn app:app --workers 4
+#   python loadtest.py 1 "AI in healthcare" --requests 200 --concurrency 32
+#   RA_PROVIDER_MODE=replay uvicorn app:app --workers 4
+#   python loadtest.py 1 "AI in healthcare" --requests 200 --concurrency 32
+#
+# Every run uses fresh conversation ids (prefixed with --run-id), so no request
+# picks up rolling memory written by an earlier run and the prompts, which key
+# the recordings, are the same on replay as they were when recorded.
+import json
+import time
+import uuid
+import asyncio
+import statistics
+from typing import List
+import httpx
+import typer
+
+app = typer.Typer(add_completion=False)
+
+
+async def _worker(client: httpx.AsyncClient, url: str, topics, run_id: str, queue: asyncio.Queue, results: list):
+    while True:
+        try:
+            i = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        payload = {
+            "topic": topics[i % len(topics)],
+            "follow_up": False,
+            "conversation_id": f"load_{run_id}_{i}",
+        }
+        start = time.perf_counter()
+        try:
+            resp = await client.post(url, json=payload)
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        results.append((time.perf_counter() - start, ok))
+
+
+async def _run(base_url: str, user_id: int, topics, run_id: str, requests: int, concurrency: int,
+               timeout: float):
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+    results = []
+    url = f"{base_url.rstrip('/')}/{user_id}/research/"
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_worker(client, url, topics, run_id, queue, results) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return results, wall
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+@app.command()
+def run(user_id: int, topic: List[str], base_url: str = "http://127.0.0.1:8000",
+        requests: int = 100, concurrency: int = 10, timeout: float = 120.0, run_id: str = ""):
+    run_id = run_id or uuid.uuid4().hex[:8]
+    results, wall = asyncio.run(_run(base_url, user_id, topic, run_id, requests, concurrency, timeout))
+    latencies = [lat for lat, ok in results if ok]
+    report = {
+        "run_id": run_id,
+        "requests": len(results),
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50) * 1000, 1),
+            "p95": round(_percentile(latencies, 95) * 1000, 1),
+            "p99": round(_percentile(latencies, 99) * 1000, 1),
+        },
+    }
+    typer.echo(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    app()
@@ -1,7 +1,44 @@
 import json
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from schemas import ResearchBrief
-from database import User, Conversation, ResearchHistory  # the classes above
+from database import User, Conversation, ResearchHistory, ConversationMemory  # the classes above
+from cache import user_cache, conversation_cache
+
+# bounds for the rolling conversation memory
+MEMORY_SUMMARY_MAX_CHARS = 1500
+MEMORY_ENTRY_MAX_CHARS = 300
+MEMORY_MAX_FINDINGS = 10
+
+
+def user_exists(db: Session, user_id: int) -> bool:
+    """Check whether a user exists, served from the in-process cache when possible"""
+    if user_cache.get(user_id):
+        return True
+    exists = db.query(User.id).filter(User.id == user_id).first() is not None
+    # only positive lookups are cached: a signin handled by another worker
+    # can't invalidate this process's cache, so a cached miss could go stale
+    if exists:
+        user_cache.set(user_id, True)
+    return exists
+
+
+def get_conversation_pk(db: Session, user_id: int, conv_id: str):
+    """Map (user_id, conversation_id) to the Conversation primary key, or None"""
+    key = (user_id, conv_id)
+    pk = conversation_cache.get(key)
+    if pk is None:
+        row = (
+            db.query(Conversation.id)
+            .filter(Conversation.user_id == user_id, Conversation.conversation_id == conv_id)
+            .first()
+        )
+        pk = row[0] if row else None
+        # like user_exists, only hits are cached: a conversation created by
+        # another worker would otherwise look missing here and get duplicated
+        if pk is not None:
+            conversation_cache.set(key, pk)
+    return pk
 
 
 def get_history(db: Session, user_id: int, conv_id: str):
@@ -30,30 +67,126 @@ def get_history(db: Session, user_id: int, conv_id: str):
 
 
 def append_brief(db: Session, user_id: int, conv_id: str, brief: ResearchBrief):
-    """Append new brief to conversation history in DB"""
-    conversation = (
-        db.query(Conversation)
-        .filter(Conversation.user_id == user_id, Conversation.conversation_id == conv_id)
-        .first()
-    )
+    """Append new brief to conversation history in DB.
+
+    This is the only write path for briefs: it stores the history row and
+    folds the brief into the conversation's rolling memory in one commit.
+    """
+    conversation_pk = get_conversation_pk(db, user_id, conv_id)
 
     # If conversation doesn’t exist, create it
-    if not conversation:
+    if conversation_pk is None:
         conversation = Conversation(user_id=user_id, conversation_id=conv_id)
         db.add(conversation)
         db.commit()
         db.refresh(conversation)
+        conversation_pk = conversation.id
+        conversation_cache.set((user_id, conv_id), conversation_pk)
 
     history_entry = ResearchHistory(
         topic=brief.topic,
         summary=brief.summary,
-        sources=json.dumps(brief.sources),  # convert list to JSON string
-        conversation_id=conversation.id
+        sources=json.dumps([e.model_dump() for e in brief.references]),  # convert list to JSON string
+        conversation_id=conversation_pk
     )
 
     db.add(history_entry)
+    update_memory(db, conversation_pk, brief)
     db.commit()
     db.refresh(history_entry)
+    return history_entry
+
+
+def _get_or_create_memory(db: Session, conversation_pk: int) -> ConversationMemory:
+    query = (
+        db.query(ConversationMemory)
+        .filter(ConversationMemory.conversation_id == conversation_pk)
+        .with_for_update()
+    )
+    memory = query.first()
+    if memory:
+        return memory
+    try:
+        # savepoint, so losing the race only rolls back this insert and not the
+        # caller's pending history row
+        with db.begin_nested():
+            memory = ConversationMemory(conversation_id=conversation_pk, rolling_summary="",
+                                        key_findings="[]", brief_count=0)
+            db.add(memory)
+    except IntegrityError:
+        # a concurrent first append created the row; update that one
+        memory = query.first()
+    return memory
+
+
+def update_memory(db: Session, conversation_pk: int, brief: ResearchBrief):
+    """Fold a new brief into the conversation's rolling memory (caller commits)"""
+    memory = _get_or_create_memory(db, conversation_pk)
+
+    # newest entry first; drop the oldest lines once the summary is over budget
+    entry = f"- {brief.topic}: {brief.summary[:MEMORY_ENTRY_MAX_CHARS]}"
+    lines = [entry] + [line for line in (memory.rolling_summary or "").split("\n") if line]
+    while len(lines) > 1 and len("\n".join(lines)) > MEMORY_SUMMARY_MAX_CHARS:
+        lines.pop()
+    memory.rolling_summary = "\n".join(lines)
+
+    findings = list(brief.key_findings)
+    seen = {f.lower() for f in findings}
+    for f in json.loads(memory.key_findings or "[]"):
+        if f.lower() not in seen:
+            seen.add(f.lower())
+            findings.append(f)
+    memory.key_findings = json.dumps(findings[:MEMORY_MAX_FINDINGS])
+    memory.brief_count = (memory.brief_count or 0) + 1
+    return memory
+
+
+def get_memory(db: Session, user_id: int, conv_id: str):
+    """Get the rolling memory of a conversation, or None if it has none yet"""
+    conversation_pk = get_conversation_pk(db, user_id, conv_id)
+    if conversation_pk is None:
+        return None
+    memory = (
+        db.query(ConversationMemory)
+        .filter(ConversationMemory.conversation_id == conversation_pk)
+        .first()
+    )
+    if not memory:
+        return None
+    return {
+        "summary": memory.rolling_summary or "",
+        "key_findings": json.loads(memory.key_findings or "[]"),
+        "brief_count": memory.brief_count or 0,
+    }
+
+
+def get_recent_history(db: Session, user_id: int, conv_id: str, limit: int = 3):
+    """Get only the last `limit` briefs of a conversation, oldest first"""
+    conversation_pk = get_conversation_pk(db, user_id, conv_id)
+    if conversation_pk is None:
+        return []
+
+    rows = (
+        db.query(ResearchHistory)
+        .filter(ResearchHistory.conversation_id == conversation_pk)
+        .order_by(ResearchHistory.id.desc())
+        .limit(limit)
+        .all()
+    )
+    briefs = []
+    for item in reversed(rows):
+        try:
+            briefs.append(
+                ResearchBrief(
+                    topic=item.topic,
+                    summary=item.summary,
+                    key_findings=[],
+                    references=json.loads(item.sources) if item.sources else []
+                )
+            )
+        except Exception as e:
+            print(f"Error loading item {item.id}: {e}")
+    return briefs
 
 
 def clear_conversation(db: Session, user_id: int, conv_id: str):
@@ -66,6 +199,7 @@ def clear_conversation(db: Session, user_id: int, conv_id: str):
     if conversation:
         db.delete(conversation)  # cascades delete to history
         db.commit()
+    conversation_cache.invalidate((user_id, conv_id))
 
 
 def list_conversations(db: Session, user_id: int):
@@ -73,3 +207,48 @@ def list_conversations(db: Session, user_id: int):
     conversations = db.query(Conversation).filter(Conversation.user_id == user_id).all()
     return [c.conversation_id for c in conversations]
 
+
+def iter_export(db: Session, user_id: int, batch_size: int = 500):
+    """Stream every conversation and brief of a user as plain dicts.
+
+    Rows are fetched as column tuples through a server-side cursor in batches
+    of ``batch_size``, so memory stays flat regardless of history size.
+    """
+    rows = (
+        db.query(
+            Conversation.id,
+            Conversation.conversation_id,
+            Conversation.created_at,
+            ResearchHistory.topic,
+            ResearchHistory.summary,
+            ResearchHistory.sources,
+            ResearchHistory.created_at,
+        )
+        .outerjoin(ResearchHistory, ResearchHistory.conversation_id == Conversation.id)
+        .filter(Conversation.user_id == user_id)
+        .order_by(Conversation.id, ResearchHistory.id)
+        .execution_options(stream_results=True)
+        .yield_per(batch_size)
+    )
+
+    current = None
+    for conv_pk, conv_id, conv_created, topic, summary, sources, created_at in rows:
+        if conv_pk != current:
+            current = conv_pk
+            yield {
+                "type": "conversation",
+                "conversation_id": conv_id,
+                "created_at": conv_created.isoformat() if conv_created else None,
+            }
+        if topic is None and summary is None:
+            # conversation without any briefs (outer join filler row)
+            continue
+        yield {
+            "type": "brief",
+            "conversation_id": conv_id,
+            "topic": topic,
+            "summary": summary,
+            "sources": json.loads(sources) if sources else [],
+            "created_at": created_at.isoformat() if created_at else None,
+        }
+
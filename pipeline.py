@@ -2,9 +2,41 @@
 # from typing import Dict
 from schemas import ResearchRequest, ResearchResponse
 from graph import build_graph
-from memory import get_history, append_brief
+from memory import get_history, get_memory, get_recent_history, MEMORY_ENTRY_MAX_CHARS
+from database import SessionLocal
+from tools import release_evidence
+import uuid
+import time
+import os
 
-graph = build_graph(get_history)
+# Default end-to-end latency budget for a research request, in seconds
+REQUEST_BUDGET = float(os.getenv("RA_REQUEST_BUDGET", "60"))
+
+
+def _load_memory(user_id, conversation_id):
+    """Read the rolling memory of a conversation in O(1)"""
+    if user_id is None or conversation_id is None:
+        return None
+    db = SessionLocal()
+    try:
+        memory = get_memory(db, int(user_id), conversation_id)
+        if memory is None:
+            # conversations from before rolling memory existed have no row;
+            # fall back to a window of their most recent briefs
+            recent = get_recent_history(db, int(user_id), conversation_id)
+            if recent:
+                memory = {
+                    "summary": "\n".join(f"- {b.topic}: {b.summary[:MEMORY_ENTRY_MAX_CHARS]}"
+                                         for b in reversed(recent)),
+                    "key_findings": [],
+                    "brief_count": len(recent),
+                }
+        return memory
+    finally:
+        db.close()
+
+
+graph = build_graph(get_history, get_memory=_load_memory)
 
 
 def run_research_pipeline(req: ResearchRequest) -> ResearchResponse:
@@ -17,22 +49,28 @@ def run_research_pipeline(req: ResearchRequest) -> ResearchResponse:
         "prior_context": None,
         "docs": [],
         "brief": None,
+        "deadline": time.time() + (req.time_budget if req.time_budget is not None else REQUEST_BUDGET),
+        "request_id": uuid.uuid4().hex,
+        "degradations": [],
     }
     # synchronous; use .astream for streaming
-    result = graph.invoke(
-        inputs,
-        config={
-            "configurable": {
-                "thread_id": req.conversation_id,  # used to resume from checkpoints
-                "checkpoint_id": req.conversation_id
+    try:
+        result = graph.invoke(
+            inputs,
+            config={
+                "configurable": {
+                    "thread_id": req.conversation_id,  # used to resume from checkpoints
+                    "checkpoint_id": req.conversation_id
+                }
             }
-        }
-    )
+        )
+    finally:
+        release_evidence(inputs["request_id"])
     brief = result["brief"]
 
-    # Persist for future follow-ups
-    append_brief(req.conversation_id, brief)
+    # Not persisted here: callers that own a user/DB session (the API) save the
+    # brief with memory.append_brief, the warmer and CLI don't save at all.
 
     # Validate + return
-    return ResearchResponse(**brief.model_dump())
+    return ResearchResponse(**brief.model_dump(), degradations=result.get("degradations") or [])
 
@@ -0,0 +1,95 @@
+# replay.py - Record/replay layer for provider calls (Gemini, Tavily)
+#
+# RA_PROVIDER_MODE   live (default) | record | replay
+# RA_CASSETTE_DIR    where cassettes are stored (default ./cassettes)
+# RA_REPLAY_LATENCY  "recorded" (default) to sleep for the recorded duration,
+#                    or a number of seconds to use as synthetic latency
+import os
+import json
+import time
+import hashlib
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when no recording exists for a request."""
+
+
+def provider_mode() -> str:
+    mode = os.getenv("RA_PROVIDER_MODE", LIVE).lower()
+    if mode not in (LIVE, RECORD, REPLAY):
+        logger.warning(f"Unknown RA_PROVIDER_MODE '{mode}', falling back to live")
+        return LIVE
+    return mode
+
+
+def is_replaying() -> bool:
+    return provider_mode() == REPLAY
+
+
+def _cassette_path(provider: str, request) -> str:
+    payload = json.dumps(request, sort_keys=True, default=str)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    cassette_dir = os.getenv("RA_CASSETTE_DIR", "./cassettes")
+    return os.path.join(cassette_dir, provider, f"{key}.json")
+
+
+def _replay_latency(recorded: float) -> float:
+    setting = os.getenv("RA_REPLAY_LATENCY", "recorded")
+    if setting == "recorded":
+        return recorded
+    try:
+        return float(setting)
+    except ValueError:
+        logger.warning(f"Invalid RA_REPLAY_LATENCY '{setting}', using recorded latency")
+        return recorded
+
+
+def call(provider: str, request, fn, dump=None, load=None):
+    """
+    Run a provider call through the record/replay layer.
+
+    `request` must be JSON-serializable and identifies the call; `fn` performs
+    the live call. `dump`/`load` convert the response to and from JSON when it
+    is not JSON-serializable as-is (e.g. Pydantic models).
+    """
+    mode = provider_mode()
+    if mode == LIVE:
+        return fn()
+
+    path = _cassette_path(provider, request)
+
+    if mode == REPLAY:
+        if not os.path.exists(path):
+            raise CassetteMissError(f"No {provider} recording for request at {path}")
+        with open(path, "r", encoding="utf-8") as f:
+            cassette = json.load(f)
+        delay = _replay_latency(cassette.get("elapsed", 0.0))
+        if delay > 0:
+            time.sleep(delay)
+        response = cassette["response"]
+        return load(response) if load else response
+
+    # record
+    start = time.perf_counter()
+    response = fn()
+    elapsed = time.perf_counter() - start
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "provider": provider,
+            "request": request,
+            "response": dump(response) if dump else response,
+            "elapsed": elapsed,
+        }, f, default=str)
+    os.replace(tmp_path, path)
+    return response
@@ -28,10 +28,11 @@ class ResearchBrief(BaseModel):
 
 class ResearchRequest(UserQuery):
     max_sources: int = 8
+    time_budget: Optional[float] = Field(None, gt=0)  # seconds; defaults to RA_REQUEST_BUDGET
 
 
 class ResearchResponse(ResearchBrief):
-    pass
+    degradations: List[str] = Field(default_factory=list)  # shortcuts taken to meet the deadline
 
 
 class SigninRequestModel(BaseModel):
@@ -0,0 +1,131 @@
+# serve.py - Production entry point: warm once, then pre-fork workers
+#
+#   python serve.py --workers 4
+#   python serve.py --workers 4 --benchmark   # report time-to-ready and exit
+#
+# The parent imports the app (graph, LLM clients, DB schema) and warms it before
+# forking, so workers start hot and share that memory copy-on-write. Search,
+# LLM and user caches are switched to a SQLite-backed store visible to all
+# workers (see cache.SharedCache).
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import traceback
+import urllib.request
+import typer
+
+START = time.perf_counter()
+
+cli = typer.Typer(add_completion=False)
+
+
+def _warm_up():
+    timings = {}
+    t = time.perf_counter()
+    from app import app  # builds the graph, LLM clients and DB schema
+    timings["import_seconds"] = round(time.perf_counter() - t, 3)
+
+    t = time.perf_counter()
+    from sqlalchemy import text
+    from database import engine
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    # don't hand pooled connections to the children. The shared cache store was
+    # already created when the app imported cache.py, which closes its SQLite
+    # connection again, so nothing is left open to leak across the fork.
+    engine.dispose()
+    timings["warmup_seconds"] = round(time.perf_counter() - t, 3)
+    return app, timings
+
+
+def _run_worker(app, sock: socket.socket, index: int, log_level: str):
+    import uvicorn
+    from database import engine
+
+    engine.dispose(close=False)
+    if index != 0:
+        # only one worker refreshes trending briefs; the others read them from the shared cache
+        os.environ["RA_WARM_ENABLED"] = "false"
+
+    config = uvicorn.Config(app, log_level=log_level)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _wait_until_ready(host: str, port: int, timeout: float) -> bool:
+    url = f"http://{host}:{port}/"
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1.0) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def _stop_workers(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in pids:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+@cli.command()
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: int = os.cpu_count() or 1,
+          shared_cache: str = "./shared_cache.db", log_level: str = "info", benchmark: bool = False):
+    # must be set before the cache module is imported by the app
+    os.environ.setdefault("RA_SHARED_CACHE_PATH", shared_cache)
+    # gRPC-based clients need this to survive the fork
+    os.environ.setdefault("GRPC_ENABLE_FORK_SUPPORT", "1")
+
+    app, timings = _warm_up()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    pids = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, index, log_level)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        pids.append(pid)
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        ready = _wait_until_ready(host, port, timeout=60.0)
+        timings["time_to_ready_seconds"] = round(time.perf_counter() - START, 3)
+        timings["workers"] = workers
+        timings["ready"] = ready
+        typer.echo(json.dumps(timings), err=not benchmark)
+        if benchmark:
+            return
+        while pids:
+            pid, status = os.wait()
+            pids.remove(pid)
+            if os.waitstatus_to_exitcode(status) != 0:
+                typer.echo(f"worker {pid} exited with status {os.waitstatus_to_exitcode(status)}", err=True)
+    finally:
+        _stop_workers(pids)
+
+
+if __name__ == "__main__":
+    cli()
@@ -31,4 +31,3 @@ def test_research_and_history_flow():
     hist_data = hist_resp.json()
     assert hist_data["brief_count"] >= 1
     assert any(b["topic"] == "Is egg veg or non-veg" for b in hist_data["briefs"])
-
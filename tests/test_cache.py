@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+from cache import TTLCache
+
+
+def test_lru_eviction_and_stats():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1      # "a" becomes most recently used
+    cache.set("c", 3)               # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_ttl_expiry_and_invalidate():
+    cache = TTLCache(maxsize=8, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+    cache = TTLCache(maxsize=8, ttl=60)
+    cache.set("a", False)
+    assert cache.get("a") is False
+    cache.invalidate("a")
+    assert cache.get("a", "missing") == "missing"
+
+
+def test_shared_cache_is_visible_across_instances(tmp_path):
+    from cache import SharedCache
+
+    path = str(tmp_path / "shared.db")
+    writer = SharedCache(path, "users", maxsize=8, ttl=60)
+    reader = SharedCache(path, "users", maxsize=8, ttl=60)
+    other = SharedCache(path, "briefs", maxsize=8, ttl=60)
+
+    writer.set((1, "conv"), None)
+    writer.set(2, {"brief": "cached"})
+    assert reader.get((1, "conv"), "missing") is None
+    assert reader.get(2) == {"brief": "cached"}
+    assert other.get(2) is None
+
+    reader.invalidate(2)
+    assert writer.get(2) is None
+    assert reader.stats()["hits"] == 2
+
+
+def test_shared_cache_evicts_least_recently_used(tmp_path):
+    from cache import SharedCache
+
+    cache = SharedCache(str(tmp_path / "shared.db"), "llm", maxsize=2, ttl=60)
+    cache.EVICT_EVERY = 1
+    cache.ACCESS_RESOLUTION = 0
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_evidence_store_keeps_text_until_last_owner_releases():
+    from cache import EvidenceStore
+
+    store = EvidenceStore()
+    store.put("req-1", "k", "text")
+    store.put("req-2", "k", "text")
+    store.release("req-1")
+    assert store.get("k") == "text"
+    store.release("req-2")
+    assert store.get("k") is None
+    assert len(store) == 0
+
+
+def test_shared_cache_treats_sqlite_errors_as_miss(tmp_path, monkeypatch):
+    import sqlite3
+    from cache import SharedCache
+
+    cache = SharedCache(str(tmp_path / "shared.db"), "users", maxsize=8, ttl=60)
+    cache.set(1, True)
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "_conn", locked)
+    assert cache.get(1, "missing") == "missing"
+    cache.set(2, True)          # must not raise into the caller
+    cache.invalidate(1)
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,159 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import time
+import types
+import pytest
+from langchain_core.documents import Document
+import graph
+from cache import llm_cache, evidence_cache
+from schemas import ResearchBrief, ResearchRequest, Evidence
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(monkeypatch):
+    monkeypatch.setenv("RA_PROVIDER_MODE", "live")
+    llm_cache.clear()
+    evidence_cache.clear()
+    yield
+
+
+def make_state(seconds_left, **extra):
+    state = {
+        "topic": "AI in healthcare",
+        "follow_up": False,
+        "conversation_id": "c1",
+        "user_id": "1",
+        "prior_context": None,
+        "docs": [],
+        "brief": None,
+        "deadline": time.time() + seconds_left,
+        "request_id": "test-request",
+        "degradations": [],
+    }
+    state.update(extra)
+    return state
+
+
+def fake_model(fn):
+    return types.SimpleNamespace(invoke=fn)
+
+
+def a_brief(topic="AI in healthcare"):
+    return ResearchBrief(topic=topic, summary="A summary long enough to validate", key_findings=["finding"])
+
+
+def test_near_deadline_serves_cached_evidence():
+    doc = Document(page_content="cached text", metadata={"source": "https://real.example/a", "title": "A"})
+    evidence_cache.set("AI in healthcare", {"max_results": 8, "docs": [doc]})
+
+    state = graph.node_retrieve(make_state(graph.LIVE_RETRIEVAL_MIN_SECONDS - 1))
+
+    assert state["degradations"] == ["cached_evidence"]
+    assert state["docs"][0].url == "https://real.example/a"
+
+
+def test_near_deadline_without_cache_reports_no_evidence():
+    state = graph.node_retrieve(make_state(graph.LIVE_RETRIEVAL_MIN_SECONDS - 1))
+
+    assert state["degradations"] == ["no_evidence"]
+    assert all(ref.is_fallback for ref in state["docs"])
+
+
+def test_short_budget_reduces_max_results(monkeypatch):
+    calls = {}
+
+    def fake_multi(queries, max_results=8, timeout=15.0, limit=None, plan=None):
+        calls.update(queries=queries, max_results=max_results, plan=plan)
+        return [Document(page_content="text", metadata={"source": "https://real.example/a", "title": "A"})]
+
+    monkeypatch.setattr(graph, "retrieve_evidence_multi", fake_multi)
+    state = graph.node_retrieve(make_state(graph.FULL_RETRIEVAL_MIN_SECONDS - 1, prior_context="earlier"))
+
+    assert calls["max_results"] == graph.REDUCED_MAX_RESULTS
+    assert calls["plan"] is None
+    assert state["degradations"] == ["reduced_max_results"]
+
+
+def test_short_budget_uses_fast_brief_model(monkeypatch):
+    used = []
+    monkeypatch.setattr(graph, "brief_llm", fake_model(lambda p: used.append("strong") or a_brief()))
+    monkeypatch.setattr(graph, "fast_brief_llm", fake_model(lambda p: used.append("fast") or a_brief()))
+
+    state = graph.node_generate(make_state(graph.STRONG_BRIEF_MIN_SECONDS - 1, prior_context=""))
+
+    assert used == ["fast"]
+    assert state["degradations"] == ["fast_brief_model"]
+
+
+def test_strong_model_failure_falls_back_to_fast_model(monkeypatch):
+    def broken(prompt):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(graph, "brief_llm", fake_model(broken))
+    monkeypatch.setattr(graph, "fast_brief_llm", fake_model(lambda p: a_brief()))
+
+    state = graph.node_generate(make_state(60, prior_context=""))
+
+    assert state["brief"].summary.startswith("A summary")
+    assert state["degradations"] == ["fast_brief_model_fallback"]
+
+
+def test_slow_summarizer_is_cut_off_at_the_deadline(monkeypatch):
+    def slow(prompt):
+        time.sleep(1.0)
+        return types.SimpleNamespace(content="too late")
+
+    monkeypatch.setattr(graph, "summarizer_llm", fake_model(slow))
+    monkeypatch.setattr(graph, "SUMMARIZE_MIN_SECONDS", 1.0)
+    monkeypatch.setattr(graph, "FULL_RETRIEVAL_MIN_SECONDS", 1.3)
+    memory = {"summary": "- Earlier topic: earlier summary", "key_findings": [], "brief_count": 1}
+
+    start = time.monotonic()
+    state = graph.node_incorporate_previous(make_state(1.5), None, lambda user_id, conv_id: memory)
+
+    assert time.monotonic() - start < 0.8
+    assert state["prior_context"] == memory["summary"]
+    assert state["degradations"] == ["skipped_summarization"]
+
+
+def test_history_branch_degrades_like_memory_branch(monkeypatch):
+    def broken(prompt):
+        raise RuntimeError("summarizer down")
+
+    monkeypatch.setattr(graph, "summarizer_llm", fake_model(broken))
+    prior = [a_brief("Earlier topic")]
+
+    state = graph.node_incorporate_previous(make_state(60), lambda conv_id: prior)
+    assert state["prior_context"].startswith("- Earlier topic:")
+    assert state["degradations"] == ["skipped_summarization"]
+
+    state = graph.node_incorporate_previous(make_state(graph.SUMMARIZE_MIN_SECONDS - 1), lambda conv_id: prior)
+    assert state["degradations"] == ["skipped_summarization"]
+
+
+def test_time_budget_must_be_positive():
+    from pydantic import ValidationError
+
+    assert ResearchRequest(topic="AI in healthcare", time_budget=5).time_budget == 5
+    for bad in (0, -1):
+        with pytest.raises(ValidationError):
+            ResearchRequest(topic="AI in healthcare", time_budget=bad)
+
+
+def test_checkpoint_round_trips_full_state(monkeypatch):
+    doc = Document(page_content="text", metadata={"source": "https://real.example/a", "title": "A"})
+    monkeypatch.setattr(graph, "retrieve_evidence_multi", lambda queries, **kwargs: [doc])
+    monkeypatch.setattr(graph, "brief_llm", fake_model(lambda p: ResearchBrief(
+        topic="AI in healthcare", summary="A summary long enough to validate", key_findings=["finding"],
+        references=[Evidence(id="1", title="A", url="https://real.example/a")])))
+    compiled = graph.build_graph(lambda conv_id: [])
+    config = {"configurable": {"thread_id": "checkpoint-test"}}
+
+    compiled.invoke(make_state(60), config=config)
+    values = compiled.get_state(config).values
+
+    assert isinstance(values["brief"], ResearchBrief)
+    assert isinstance(values["brief"].references[0], Evidence)
+    assert isinstance(values["docs"][0], graph.EvidenceRef)
+    assert values["docs"][0].url == "https://real.example/a"
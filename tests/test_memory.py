@@ -38,3 +38,134 @@ def test_clear_conversation(temp_mem_dir):
     clear_conversation("conv1")
     assert list_conversations() == []
 
+
+@pytest.fixture
+def db():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, User
+    from cache import user_cache, conversation_cache
+
+    user_cache.clear()
+    conversation_cache.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, name="Test", email="test@example.com", password="x"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_iter_export_streams_conversations_and_briefs(db):
+    from database import Conversation, ResearchHistory
+    from memory import iter_export
+
+    conv = Conversation(conversation_id="c1", user_id=1)
+    empty = Conversation(conversation_id="c2", user_id=1)
+    db.add_all([conv, empty])
+    db.commit()
+    db.add(ResearchHistory(topic="T1", summary="S1", sources=json.dumps([{"url": "u"}]),
+                           conversation_id=conv.id))
+    db.commit()
+
+    records = list(iter_export(db, 1, batch_size=1))
+    assert [r["type"] for r in records] == ["conversation", "brief", "conversation"]
+    assert records[1]["sources"] == [{"url": "u"}]
+    assert records[2]["conversation_id"] == "c2"
+
+
+def test_rolling_memory_is_bounded(db):
+    from database import Conversation
+    from memory import update_memory, get_memory, MEMORY_MAX_FINDINGS
+
+    conv = Conversation(conversation_id="long", user_id=1)
+    db.add(conv)
+    db.commit()
+    for i in range(20):
+        brief = ResearchBrief(topic=f"Topic {i}", summary="A fairly long summary text " * 20,
+                              key_findings=[f"finding {i}", "shared finding"])
+        update_memory(db, conv.id, brief)
+        db.commit()
+
+    memory = get_memory(db, 1, "long")
+    assert memory["brief_count"] == 20
+    assert memory["summary"].startswith("- Topic 19:")
+    assert len(memory["key_findings"]) == MEMORY_MAX_FINDINGS
+    assert memory["key_findings"].count("shared finding") == 1
+
+
+def test_get_recent_history_returns_last_n_oldest_first(db):
+    from memory import append_brief, get_memory, get_recent_history
+
+    for i in range(5):
+        brief = ResearchBrief(topic=f"Topic {i}", summary=f"Summary number {i} of the conversation",
+                              key_findings=[f"finding {i}"])
+        append_brief(db, 1, "windowed", brief)
+
+    recent = get_recent_history(db, 1, "windowed", limit=3)
+    assert [b.topic for b in recent] == ["Topic 2", "Topic 3", "Topic 4"]
+    # each append is folded into the rolling memory exactly once
+    assert get_memory(db, 1, "windowed")["brief_count"] == 5
+
+
+def test_conversation_created_elsewhere_is_not_duplicated(db):
+    from database import Conversation
+    from memory import get_conversation_pk, append_brief
+
+    assert get_conversation_pk(db, 1, "shared") is None
+    # another worker creates the conversation after our miss
+    db.add(Conversation(conversation_id="shared", user_id=1))
+    db.commit()
+    brief = ResearchBrief(topic="Topic", summary="A summary long enough", key_findings=["one"])
+    append_brief(db, 1, "shared", brief)
+
+    assert db.query(Conversation).filter(Conversation.conversation_id == "shared").count() == 1
+
+
+def test_user_exists_does_not_cache_misses(db):
+    from database import User
+    from cache import user_cache
+    from memory import user_exists
+
+    assert user_exists(db, 2) is False
+    db.add(User(id=2, name="New", email="new@example.com", password="x"))
+    db.commit()
+    # e.g. signed in through another worker, which can't invalidate our cache
+    assert user_exists(db, 2) is True
+    assert user_cache.get(2) is True
+
+
+def test_conversation_cache_invalidation(db):
+    from cache import conversation_cache
+    from memory import get_conversation_pk, append_brief, clear_conversation
+
+    assert get_conversation_pk(db, 1, "cached") is None
+    assert conversation_cache.get((1, "cached"), "missing") == "missing"   # misses aren't cached
+    brief = ResearchBrief(topic="Topic", summary="A summary long enough", key_findings=["one"])
+    append_brief(db, 1, "cached", brief)
+    pk = conversation_cache.get((1, "cached"))
+    assert pk is not None
+    assert get_conversation_pk(db, 1, "cached") == pk
+
+    clear_conversation(db, 1, "cached")
+    assert conversation_cache.get((1, "cached"), "missing") == "missing"
+    assert get_conversation_pk(db, 1, "cached") is None
+
+
+def test_ensure_indexes_upgrades_existing_history_table():
+    from sqlalchemy import create_engine, inspect, text
+    from database import ensure_indexes
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        # research_history as created before the conversation_id index existed
+        conn.execute(text(
+            "CREATE TABLE research_history (id INTEGER PRIMARY KEY, topic VARCHAR, summary TEXT, "
+            "sources TEXT, created_at DATETIME, conversation_id INTEGER)"
+        ))
+    ensure_indexes(engine)
+    ensure_indexes(engine)  # idempotent
+
+    indexed = {tuple(ix["column_names"]) for ix in inspect(engine).get_indexes("research_history")}
+    assert ("conversation_id",) in indexed
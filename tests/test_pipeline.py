@@ -45,3 +45,72 @@ def test_retrieve_evidence_google_real():
         assert "title" in doc.metadata
         assert "source" in doc.metadata
 
+
+def test_reciprocal_rank_fusion_merges_by_source():
+    from tools import reciprocal_rank_fusion
+
+    def doc(url):
+        return Document(page_content=f"content of {url}", metadata={"source": url, "title": url})
+
+    first = [doc("a"), doc("b"), doc("c")]
+    second = [doc("b"), doc("d")]
+    fused = reciprocal_rank_fusion([first, second])
+
+    assert [d.metadata["source"] for d in fused] == ["b", "a", "d", "c"]
+    assert len(reciprocal_rank_fusion([first, second], limit=2)) == 2
+
+
+def test_compact_documents_moves_text_to_side_store():
+    from tools import compact_documents, evidence_text, release_evidence
+
+    docs = [Document(page_content="shared text", metadata={"source": "https://a", "title": "A"}),
+            Document(page_content="shared text", metadata={"source": "https://b", "title": "B"})]
+    refs = compact_documents(docs, "req-1")
+    compact_documents(docs[:1], "req-2")
+
+    assert refs[0].id == refs[1].id          # identical text is stored once
+    assert refs[0].url == "https://a"
+    assert evidence_text(refs[1]) == "shared text"
+    assert not hasattr(refs[0], "__dict__")
+
+    release_evidence("req-1")
+    assert evidence_text(refs[0]) == "shared text"   # still pinned by req-2
+    release_evidence("req-2")
+    assert evidence_text(refs[0]) is None
+
+
+def test_retrieve_evidence_multi_keeps_partial_results(monkeypatch):
+    import time
+    import tools
+
+    def fake_search(query, max_results=8):
+        if query == "slow":
+            time.sleep(1.0)
+        return [Document(page_content=f"about {query}", metadata={"source": f"https://{query}", "title": query})]
+
+    monkeypatch.setattr(tools, "retrieve_evidence", fake_search)
+    start = time.monotonic()
+    docs = tools.retrieve_evidence_multi(["fast"], timeout=0.3, plan=lambda: ["fast", "slow"])
+
+    assert time.monotonic() - start < 0.9
+    assert [d.metadata["source"] for d in docs] == ["https://fast"]
+    assert not tools.is_fallback(docs)
+
+
+def test_retrieve_evidence_multi_bounds_the_planner(monkeypatch):
+    import time
+    import tools
+
+    def fake_search(query, max_results=8):
+        return [Document(page_content=f"about {query}", metadata={"source": f"https://{query}", "title": query})]
+
+    def slow_plan():
+        time.sleep(2.0)
+        return ["late"]
+
+    monkeypatch.setattr(tools, "retrieve_evidence", fake_search)
+    start = time.monotonic()
+    docs = tools.retrieve_evidence_multi(["topic"], timeout=0.3, plan=slow_plan)
+
+    assert time.monotonic() - start < 1.0
+    assert [d.metadata["source"] for d in docs] == ["https://topic"]
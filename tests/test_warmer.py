@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from warmer import top_topics, record_topic_request, _evidence_overlap
+
+
+def test_top_topics_orders_by_frequency():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for topic in ["AI in healthcare", "ai in  healthcare", "Quantum computing", "AI in healthcare",
+                  "Quantum computing"]:
+        record_topic_request(db, topic)
+    record_topic_request(db, "AI in healthcare")
+
+    assert top_topics(db, limit=2) == [("ai in healthcare", "AI in healthcare"),
+                                       ("quantum computing", "Quantum computing")]
+    db.close()
+
+
+def test_evidence_overlap():
+    assert _evidence_overlap(["a", "b"], ["a", "b", "c", "d"]) == 1.0
+    assert _evidence_overlap(["a", "b"], ["c", "d"]) == 0.0
+    assert _evidence_overlap([], ["a"]) == 0.0
+
+
+def test_fallback_evidence_does_not_invalidate(monkeypatch):
+    import time
+    import warmer
+    from cache import brief_cache
+    from langchain_core.documents import Document
+
+    placeholder = [Document(page_content="unavailable",
+                            metadata={"source": "https://example.com/fallback", "is_fallback": True})]
+    monkeypatch.setattr(warmer, "retrieve_evidence", lambda topic, use_cache=True: placeholder)
+    entry = {"brief": {}, "urls": ["https://real.example/a"], "generated_at": time.time()}
+    brief_cache.set("cached topic", entry)
+
+    assert warmer.evidence_changed("cached topic", "Cached topic", entry) is False
+    assert brief_cache.get("cached topic") is not None
+
+
+def test_refresh_once_warms_within_budget(monkeypatch):
+    import warmer
+    from cache import brief_cache
+    from schemas import ResearchResponse, Evidence
+
+    brief_cache.clear()
+    monkeypatch.setattr(warmer, "top_topics", lambda db: [("topic a", "Topic A"), ("topic b", "Topic B"),
+                                                           ("topic c", "Topic C")])
+    monkeypatch.setattr(warmer, "run_research_pipeline", lambda req: ResearchResponse(
+        topic=req.topic, summary="A warm summary of the topic", key_findings=["finding"],
+        references=[Evidence(id="1", title="T", url="https://real.example/a")]))
+
+    assert warmer.refresh_once(budget=2) == 2
+    assert warmer.get_warm_brief("topic A").topic == "Topic A"
+    assert warmer.get_warm_brief("topic c") is None
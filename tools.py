@@ -1,10 +1,16 @@
 # tools.py - Evidence retrieval tools
 import os
+import sys
+import hashlib
+import time
 import logging
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Callable, List, NamedTuple, Optional
 from langchain_core.documents import Document
 from langchain_community.tools import TavilySearchResults
 from dotenv import load_dotenv
+import replay
+from cache import evidence_cache, evidence_text_store
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -13,27 +19,41 @@ tavily_api_key = os.getenv("TAVILY_API_KEY")
 if not tavily_api_key:
     logger.warning("TAVILY_API_KEY not found in environment variables")
 
+# Upper bound on concurrent searches for a single request (topic + sub-queries)
+MAX_PARALLEL_QUERIES = 4
 
-def retrieve_evidence(query: str, max_results: int = 8) -> List[Document]:
+
+def retrieve_evidence(query: str, max_results: int = 8, use_cache: bool = True) -> List[Document]:
     """
-    Retrieve evidence documents using Tavily search
+    Retrieve evidence documents using Tavily search.
+    Results are served read-through from evidence_cache (shared across workers
+    under serve.py) unless `use_cache` is False; record/replay runs always skip
+    it so they measure the provider.
     """
+    live = replay.provider_mode() == replay.LIVE
+    if live and use_cache:
+        cached = evidence_cache.get(query)
+        # a search for more results also answers one for fewer
+        if cached and cached["max_results"] >= max_results:
+            return cached["docs"][:max_results]
+
     try:
-        if not tavily_api_key:
+        if not tavily_api_key and not replay.is_replaying():
             logger.error("Tavily API key not configured")
             return _create_fallback_documents(query)
 
-        search = TavilySearchResults(
-            api_key=tavily_api_key,
-            max_results=max_results,
-            search_depth="advanced",
-            include_answer=True,
-            include_raw_content=False,
-            include_images=False
-        )
+        def search():
+            return TavilySearchResults(
+                api_key=tavily_api_key,
+                max_results=max_results,
+                search_depth="advanced",
+                include_answer=True,
+                include_raw_content=False,
+                include_images=False
+            ).invoke({"query": query})
 
         logger.info(f"Searching for: {query}")
-        results = search.invoke({"query": query})
+        results = replay.call("tavily", {"query": query, "max_results": max_results}, search)
 
         documents = []
         for i, result in enumerate(results):
@@ -64,6 +84,8 @@ def retrieve_evidence(query: str, max_results: int = 8) -> List[Document]:
                 continue
 
         logger.info(f"Retrieved {len(documents)} documents")
+        if documents and live:
+            evidence_cache.set(query, {"max_results": max_results, "docs": documents})
         return documents
 
     except Exception as e:
@@ -71,6 +93,146 @@ def retrieve_evidence(query: str, max_results: int = 8) -> List[Document]:
         return _create_fallback_documents(query)
 
 
+class EvidenceRef(NamedTuple):
+    """
+    Compact evidence record kept in the graph state. Titles and URLs are
+    interned and the text lives in evidence_text_store under `id`, so each
+    checkpoint only copies a few shared references per document.
+    """
+    id: str
+    title: str
+    url: str
+    is_fallback: bool = False
+
+
+def compact_documents(docs: List[Document], owner: str) -> List[EvidenceRef]:
+    """
+    Move document text into the side store and return references to it. The
+    text stays pinned until `release_evidence(owner)` is called.
+    """
+    refs = []
+    for doc in docs:
+        text = doc.page_content
+        text_id = sys.intern(hashlib.sha1(text.encode("utf-8")).hexdigest()[:16])
+        evidence_text_store.put(owner, text_id, text)
+        refs.append(EvidenceRef(
+            id=text_id,
+            title=sys.intern(doc.metadata.get('title', '')),
+            url=sys.intern(doc.metadata.get('source', '')),
+            is_fallback=bool(doc.metadata.get('is_fallback', False))
+        ))
+    return refs
+
+
+def evidence_text(ref: EvidenceRef) -> Optional[str]:
+    """Resolve the text of an EvidenceRef, or None if it is no longer stored"""
+    text = evidence_text_store.get(ref.id)
+    if text is None:
+        logger.warning(f"Evidence text {ref.id} for {ref.url or ref.title} is missing from the side store")
+    return text
+
+
+def release_evidence(owner: str):
+    """Unpin all evidence text stored for a finished request"""
+    evidence_text_store.release(owner)
+
+
+def get_cached_evidence(query: str) -> List[Document]:
+    """
+    Return previously retrieved documents for a query, or fallback documents
+    when nothing is cached. Never touches the network.
+    """
+    cached = evidence_cache.get(query)
+    if cached:
+        return cached["docs"]
+    return _create_fallback_documents(query)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 60,
+                           limit: Optional[int] = None) -> List[Document]:
+    """
+    Merge ranked document lists with reciprocal rank fusion (score = sum 1/(k + rank)).
+    Documents are identified by source URL, falling back to their content.
+    """
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc.metadata.get('source') or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    if limit is not None:
+        ranked = ranked[:limit]
+    return [docs[key] for key in ranked]
+
+
+def is_fallback(docs: List[Document]) -> bool:
+    """True when a result list holds only placeholder documents"""
+    return bool(docs) and all(d.metadata.get('is_fallback') for d in docs)
+
+
+def retrieve_evidence_multi(queries: List[str], max_results: int = 8, timeout: float = 15.0,
+                            limit: Optional[int] = None,
+                            plan: Optional[Callable[[], List[str]]] = None) -> List[Document]:
+    """
+    Run several queries concurrently under one shared deadline and fuse the
+    results. `plan`, if given, runs while the initial queries are already
+    searching and returns further queries to run; if it hasn't returned by
+    the deadline its queries are dropped.
+
+    Each call gets its own executor, so one request's slow searches never queue
+    behind another's. Queries still pending at the deadline are cancelled and
+    whatever arrived in time is used; placeholder documents are only returned
+    when no real results arrived at all.
+    """
+    if not queries:
+        return []
+    deadline = time.monotonic() + max(timeout, 0.0)
+    # one extra worker so the planner never waits behind a search
+    executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_QUERIES + (plan is not None),
+                                  thread_name_prefix="retrieve")
+    try:
+        submitted = list(queries[:MAX_PARALLEL_QUERIES])
+        futures = [executor.submit(retrieve_evidence, q, max_results) for q in submitted]
+
+        if plan is not None:
+            plan_future = executor.submit(plan)
+            try:
+                planned = plan_future.result(timeout=max(deadline - time.monotonic(), 0.0))
+            except FutureTimeoutError:
+                logger.warning("Sub-query planning missed the retrieval deadline, dropping planned queries")
+                plan_future.cancel()
+                planned = []
+            except Exception as e:
+                logger.error(f"Error planning sub-queries: {e}")
+                planned = []
+            for q in planned:
+                if len(submitted) >= MAX_PARALLEL_QUERIES:
+                    break
+                if q.lower() not in (x.lower() for x in submitted):
+                    submitted.append(q)
+                    futures.append(executor.submit(retrieve_evidence, q, max_results))
+
+        done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0.0))
+        if not_done:
+            logger.warning(f"{len(not_done)} of {len(futures)} sub-queries missed the retrieval deadline")
+    finally:
+        # drop anything still queued; running searches finish on their own thread
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # keep the submission order so the primary query is fused first
+    result_lists = [
+        f.result() for f in futures
+        if f in done and not f.cancelled() and not f.exception()
+    ]
+    real = [docs for docs in result_lists if docs and not is_fallback(docs)]
+    if not real:
+        return _create_fallback_documents(queries[0])
+    return reciprocal_rank_fusion(real, limit=limit)
+
+
 def _create_fallback_documents(query: str) -> List[Document]:
     """
     Create fallback documents when search fails
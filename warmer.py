@@ -0,0 +1,167 @@
+# warmer.py - Background refresher that keeps briefs for trending topics warm
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import SessionLocal, TopicRequest
+from schemas import ResearchRequest, ResearchResponse
+from cache import brief_cache
+from pipeline import run_research_pipeline
+from tools import retrieve_evidence
+
+logger = logging.getLogger(__name__)
+
+WARM_INTERVAL = float(os.getenv("RA_WARM_INTERVAL", "900"))          # seconds between refreshes
+WARM_TOP_N = int(os.getenv("RA_WARM_TOP_N", "20"))                   # topics tracked per refresh
+WARM_BUDGET = int(os.getenv("RA_WARM_BUDGET", "10"))                 # max provider runs per refresh (checks + briefs)
+WARM_WINDOW_HOURS = float(os.getenv("RA_WARM_WINDOW_HOURS", "24"))   # popularity window
+WARM_STALE_AFTER = float(os.getenv("RA_WARM_STALE_AFTER", "3600"))   # regenerate after this many seconds
+WARM_MIN_OVERLAP = float(os.getenv("RA_WARM_MIN_OVERLAP", "0.5"))    # evidence overlap below this invalidates
+WARM_CHECK_AFTER = float(os.getenv("RA_WARM_CHECK_AFTER", "0.5"))     # re-check evidence past this share of staleness
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def record_topic_request(db: Session, topic: str):
+    """Count a research request towards its topic's popularity"""
+    db.add(TopicRequest(topic=topic, normalized_topic=normalize_topic(topic)))
+    db.commit()
+
+
+def top_topics(db: Session, limit: int = WARM_TOP_N,
+               window_hours: float = WARM_WINDOW_HOURS) -> List[Tuple[str, str]]:
+    """
+    Most requested topics in the recent window, most frequent first, as
+    (normalized key, most common spelling users typed) pairs. Counted from the request
+    topics rather than ResearchHistory.topic, which holds the LLM's rewording.
+    """
+    since = datetime.utcnow() - timedelta(hours=window_hours)
+    rows = (
+        db.query(TopicRequest.normalized_topic, TopicRequest.topic, func.count(TopicRequest.id))
+        .filter(TopicRequest.created_at >= since)
+        .group_by(TopicRequest.normalized_topic, TopicRequest.topic)
+        .all()
+    )
+    hits, spelling = {}, {}
+    for key, topic, count in rows:
+        if not key:
+            continue
+        hits[key] = hits.get(key, 0) + count
+        # show the most common spelling of each topic
+        if count > spelling.get(key, ("", 0))[1]:
+            spelling[key] = (topic, count)
+    ranked = sorted(hits, key=hits.get, reverse=True)[:limit]
+    return [(key, spelling[key][0]) for key in ranked]
+
+
+def get_warm_brief(topic: str) -> Optional[ResearchResponse]:
+    """Return a fresh precomputed brief for a topic, if one is cached"""
+    entry = brief_cache.get(normalize_topic(topic))
+    if not entry or time.time() - entry["generated_at"] > WARM_STALE_AFTER:
+        return None
+    return ResearchResponse(**entry["brief"])
+
+
+def _evidence_overlap(cached_urls: List[str], fresh_urls: List[str]) -> float:
+    cached, fresh = set(cached_urls), set(fresh_urls)
+    if not cached or not fresh:
+        return 0.0
+    return len(cached & fresh) / min(len(cached), len(fresh))
+
+
+def evidence_changed(key: str, topic: str, entry: dict) -> bool:
+    """
+    True when a fresh search returns evidence that differs substantially from
+    what the cached brief cited. Placeholder results (search down or not
+    configured) never invalidate a good cached brief.
+    """
+    fresh = retrieve_evidence(topic, use_cache=False)
+    if not fresh or any(d.metadata.get("is_fallback") for d in fresh):
+        return False
+    fresh_urls = [d.metadata.get("source", "") for d in fresh]
+    overlap = _evidence_overlap(entry["urls"], [u for u in fresh_urls if u])
+    if overlap < WARM_MIN_OVERLAP:
+        logger.info(f"Evidence for '{topic}' changed (overlap {overlap:.2f}), invalidating")
+        brief_cache.invalidate(key)
+        return True
+    return False
+
+
+def refresh_once(budget: int = WARM_BUDGET) -> int:
+    """
+    Run one refresh cycle; returns how many briefs were generated. Every
+    provider-backed step (an evidence check or a brief generation) costs one
+    unit of `budget`.
+    """
+    db = SessionLocal()
+    try:
+        topics = top_topics(db)
+    finally:
+        db.close()
+
+    spent = 0
+    generated = 0
+    for key, topic in topics:
+        if spent >= budget:
+            break
+        try:
+            entry = brief_cache.get(key)
+            if entry:
+                age = time.time() - entry["generated_at"]
+                if age <= WARM_STALE_AFTER * WARM_CHECK_AFTER:
+                    # recent enough that a search to re-check it isn't worth the cost
+                    continue
+                if age <= WARM_STALE_AFTER:
+                    spent += 1
+                    if not evidence_changed(key, topic, entry) or spent >= budget:
+                        continue
+
+            spent += 1
+            # generate from the original wording so the served brief keeps its casing
+            brief = run_research_pipeline(ResearchRequest(topic=topic, conversation_id=f"warm_{key}"))
+            if brief.degradations:
+                # don't pin a degraded answer for everyone asking about this topic
+                continue
+            brief_cache.set(key, {
+                "brief": brief.model_dump(),
+                "urls": [r.url for r in brief.references if r.url],
+                "generated_at": time.time(),
+            })
+            generated += 1
+        except Exception as e:
+            logger.error(f"Error warming topic '{topic}': {e}")
+    logger.info(f"Warmed {generated} of {len(topics)} trending topics ({spent}/{budget} budget used)")
+    return generated
+
+
+class BriefWarmer:
+    """Daemon thread that calls refresh_once every `interval` seconds."""
+
+    def __init__(self, interval: float = WARM_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="brief-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                refresh_once()
+            except Exception as e:
+                logger.error(f"Brief warmer cycle failed: {e}")
+            self._stop.wait(self.interval)